@@ -2,14 +2,17 @@ import os
 import re
 import io
 import logging
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from zipfile import ZipFile
 from bs4 import BeautifulSoup
 import requests
-import gzip
+import zstandard
 import pickle
 from pickle import load, dump
-from numpy import array, arange, genfromtxt, concatenate
+from numpy import array, concatenate, iinfo
+from pandas import read_csv, to_numeric
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +28,7 @@ class DataDownloader():
         cache_filename (str) - a template for filename,
                                where the parsed data will be saved
     """
+    __workers = min(14, os.cpu_count() or 1)
     re_zip = re.compile(r'^.*datagis.*([0-1]\d-|-rok-)?(\d{4})\.zip')
     region_file = {
         'PHA': '00.csv',
@@ -61,25 +65,27 @@ class DataDownloader():
         'o', 'p', 'q', 'r', 's', 't', 'Lokalita', 'Region'
     ]
     types = [
-        'U12', 'int8', 'U3', 'U10', 'int8', 'U5',
+        'U12', 'int8', 'U5', 'datetime64[D]', 'int8', 'U5',
         'int8', 'int8', 'int8', 'int8', 'int8', 'int8',
-        'int16', 'int8', 'int8', 'int8', 'int16', 'int8',
+        'int16', 'int8', 'int8', 'int8', 'int32', 'int8',
         'int8', 'int8', 'int8', 'int8', 'int8', 'int8', 
         'int8', 'int8', 'int8', 'int8', 'int8', 'int8',
         'int8', 'int8', 'int8', 'int8', 'int8', 'int8',  
-        'int8', 'int8', 'int8', 'int8', 'int8', 'int16',
+        'int8', 'int8', 'int8', 'int8', 'int8', 'int32',
         'int8', 'int8', 'int8', 'U16', 'U16', 'U16', 'U16',
         'U16', 'U16', 'U50', 'U25', 'U16', 'U20', 'U16',
         'U16', 'U16', 'U20', 'U16', 'U6', 'U6', 'U20', 'U20', 
     ]
+    numeric_cols = [idx for idx, col_type in enumerate(types) if col_type.startswith('int')]
 
     def __init__(self, url="https://ehw.fit.vutbr.cz/izv/",
-                 folder="data", cache_filename="data_{}.pkl.gz"):
+                 folder="data", cache_filename="data_{}.pkl.zst"):
         
         self.__folder = os.path.join(os.getcwd(), folder)
         self.__url = url
         self.__cache = cache_filename
         self.__mem_data = dict()
+        self.__mem_lock = threading.Lock()
 
     def __get_latest_zip_urls(self, links):
         """Get names of zip files with the most actual information
@@ -115,6 +121,36 @@ class DataDownloader():
         if last_match:
             yield last_match.group(0)
 
+    @staticmethod
+    def __fix_column(col):
+        """Remove quotes and replace decimal commas in a column of strings"""
+        return (col.str.replace('\"', '', regex=False)
+                   .str.replace(',', '.', regex=False))
+
+    def __to_int(self, col, col_type, zip_fname):
+        """Convert a column of strings to the given int type
+
+        If some value does not fit into the type, the column is kept
+        as int64 instead of being truncated.
+
+        Args:
+            col (pd.Series) - a column of the parsed csv file
+            col_type (str) - int type of the column from the types table
+            zip_fname (str) - name of the parsed zip file (for logging)
+
+        Returns:
+            nd_array with converted data
+        """
+        values = to_numeric(col).to_numpy()
+        limits = iinfo(col_type)
+
+        if len(values) and (values.min() < limits.min or values.max() > limits.max):
+            logger.warning('%s in %s does not fit into %s',
+                           self.header[col.name], zip_fname, col_type)
+            return values
+
+        return values.astype(col_type)
+
     def __parse_zip_file(self, zip_fname, region):
         """Function for parsing zip file
 
@@ -123,21 +159,8 @@ class DataDownloader():
             region (str) - name of region for parsing
         
         Returns:
-            nd_array with parsed and converted data
+            list of nd_arrays (one per column) with parsed and converted data
         """
-        def converter(idx):
-            def wrap(data):
-                data = data.replace('\"', '').replace(r',', r'.')
-
-                if self.types[idx] == 'int8' and data == 'XX':
-                    return '0'
-
-                if data == '':
-                    return '' if 'U' in self.types[idx] else '0'
-                return data
-
-            return wrap
-
         zip_fname = os.path.join(self.__folder, zip_fname)
 
         with ZipFile(zip_fname, 'r') as zip_file:
@@ -146,23 +169,53 @@ class DataDownloader():
             if csv_name not in zip_file.namelist():
                 logger.warning('%s is not in %s', region, zip_file.filename)
                 return tuple()
-            
-            converters = {idx: converter(idx) for idx in arange(0, 64)}
 
             kwargs = {
-                'fname': zip_file.open(csv_name, 'r'),
-                'delimiter': ';',
+                'filepath_or_buffer': io.BytesIO(zip_file.read(csv_name)),
+                'sep': ';',
+                'header': None,
                 'encoding': 'cp1250',
-                'usecols': arange(0, 64),
-                'dtype': 'U23',
-                'converters': converters,
+                'usecols': range(0, 64),
+                'dtype': str,
+                'na_filter': False,
+                'engine': 'c',
             }
 
-            data = genfromtxt(**kwargs).T
-            for idx, data_col in enumerate(data):
-                data_col = data_col.astype(self.types[idx])
+            df = read_csv(**kwargs)
+
+        df = df.apply(self.__fix_column)
+        numeric = df[self.numeric_cols]
+        df[self.numeric_cols] = numeric.mask(numeric.isin(['XX', '']), '0')
+
+        data = [
+            self.__to_int(df[idx], col_type, zip_fname) if idx in self.numeric_cols
+            else df[idx].to_numpy().astype(col_type)
+            for idx, col_type in enumerate(self.types)
+        ]
+        data.append(array([region]*len(df), dtype='U3'))
+
+        return data
+
+    def __concatenate_columns(self, blocks):
+        """Function for joining column-wise data of several blocks
+
+        Args:
+            blocks (list) - lists of nd_arrays (one per column),
+                            empty blocks are skipped
+
+        Returns:
+            list of nd_arrays (one per column) keeping their dtypes
+        """
+        blocks = [block for block in blocks if block]
+
+        return [
+            concatenate([block[idx] for block in blocks])
+            for idx in range(len(self.header))
+        ]
 
-            return concatenate((data, array([[region]*data.shape[1]])), axis=0)
+    def __cache_path(self, region):
+        """Get path to the cache file of the given region"""
+        return os.path.join(self.__folder, self.__cache.format(region))
 
     def __get_region_data(self, region):
         """Function for getting and saving data
@@ -177,41 +230,58 @@ class DataDownloader():
         Returns:
             tuple (header, data) 
         """
-        if region in self.__mem_data:
-            return self.__mem_data['region']
+        with self.__mem_lock:
+            if region in self.__mem_data:
+                return self.__mem_data[region]
 
-        cache_path = os.path.join(self.__folder, self.__cache.format(region))
+        cache_path = self.__cache_path(region)
         if os.path.exists(cache_path):
-            return load(gzip.open(cache_path, 'rb'))
+            with open(cache_path, 'rb') as cache_file, \
+                    zstandard.ZstdDecompressor().stream_reader(cache_file) as cache:
+                data = load(cache)
+        else:
+            data = self.parse_region_data(region)
+            with open(cache_path, 'wb') as cache_file, \
+                    zstandard.ZstdCompressor(level=3).stream_writer(cache_file) as cache:
+                dump(data, cache, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self.__mem_lock:
+            self.__mem_data[region] = data
 
-        data = self.parse_region_data(region)
-        with gzip.open(cache_path, 'wb') as cache:
-            dump(data, cache)
-        
-        self.__mem_data[region] = data
-            
         return data
 
+    def __download_zip(self, session, zip_url):
+        """Function for downloading a single zip file into the folder
+
+        Args:
+            session (requests.Session) - session shared by all downloads
+            zip_url (str) - URL of the zip file relative to the main URL
+        """
+        # get the last pathname of a zip file and save it in the folder
+        zip_fname = os.path.split(zip_url)[-1]
+        zip_fname = os.path.join(self.__folder, zip_fname)
+
+        with session.get(self.__url + zip_url, stream=True) as zip_file, \
+                open(zip_fname, 'wb') as f:
+            for chunk in zip_file.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+
     def download_data(self):
         """Function for downloading zip files with data"""
         if not os.path.exists(self.__folder):
             os.mkdir(self.__folder)
 
-        headers = {"User-Agent": "Chrome/70.0.3538.77"}
-        respond = requests.get(url=self.__url, headers=headers)
-
-        soup = BeautifulSoup(respond.text, 'html.parser')
-        zip_urls = self.__get_latest_zip_urls(soup.find_all('a'))
+        with requests.Session() as session:
+            session.headers.update({"User-Agent": "Chrome/70.0.3538.77"})
+            respond = session.get(url=self.__url)
 
-        for zip_url in zip_urls:
-            zip_file = requests.get(self.__url + zip_url, stream=True)
+            soup = BeautifulSoup(respond.text, 'html.parser')
+            zip_urls = self.__get_latest_zip_urls(soup.find_all('a'))
 
-            # get the last pathname of a zip file and save it in the folder
-            zip_fname = os.path.split(zip_url)[-1]
-            zip_fname = os.path.join(self.__folder, zip_fname)
-
-            with open(zip_fname, 'wb') as f:
-                f.write(zip_file.content)
+            with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+                list(executor.map(
+                    lambda zip_url: self.__download_zip(session, zip_url), zip_urls
+                ))
 
     def parse_region_data(self, region):
         """Function for getting and saving data
@@ -224,7 +294,8 @@ class DataDownloader():
             region (str) - name of region for parsing
         
         Returns:
-            tuple (header, data) 
+            tuple (header, data), where data is a list of nd_arrays
+            (one per column of header)
         """
         def folder_contains_zip():
             for fname in os.listdir(self.__folder):
@@ -240,14 +311,23 @@ class DataDownloader():
             logger.warning('%s is not in region list', region)
             return        
 
-        return self.header, concatenate([
+        return self.header, self.__concatenate_columns([
             self.__parse_zip_file(zip_fname, region)
             for zip_fname in os.listdir(self.__folder)
             if self.re_zip.search(zip_fname)
-        ], axis=1)
+        ])
 
 
-    def get_list(self, regions=None):        
+    def get_list(self, regions=None):
+        """Function for getting data of the given regions
+
+        Args:
+            regions (list) - names of regions, all regions if not given
+
+        Returns:
+            tuple (header, data), where data is a list of nd_arrays
+            (one per column of header)
+        """
         if not regions:
             regions = [
                 'PHA', 'STC', 'JHC', 'PLK', 'ULK', 
@@ -255,10 +335,22 @@ class DataDownloader():
                 'VYS', 'PAK', 'LBK', 'KVK',
             ]
 
-        return self.header, concatenate([
-            self.__get_region_data(region)[1]
-            for region in regions
-        ], axis=1)
+        # only loading of cached regions runs concurrently, parsing holds
+        # the GIL most of the time and keeps whole string tables in memory
+        cached = [
+            region for region in regions
+            if region in self.__mem_data or os.path.exists(self.__cache_path(region))
+        ]
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            regions_data = dict(zip(cached, executor.map(self.__get_region_data, cached)))
+
+        for region in regions:
+            if region not in regions_data:
+                regions_data[region] = self.__get_region_data(region)
+
+        return self.header, self.__concatenate_columns([
+            regions_data[region][1] for region in regions
+        ])
 
 if __name__ == "__main__":
     data = DataDownloader().get_list(['PHA', 'STC', 'HHK'])
@@ -1,7 +1,9 @@
 import argparse
 
-from download import DataDownloader, os, arange
+from download import DataDownloader, os
+import matplotlib
 import matplotlib.pyplot as plt
+import pandas as pd
 
 
 def parse_arguments():
@@ -34,22 +36,14 @@ def get_accidents_count(data_source):
         data_source (tuple) - main data for plotting
 
     Returns:
-        dict, with count of accidents in regions
+        pd.DataFrame, with count of accidents in regions (columns) by year (rows)
     """
-    count = dict()
-    
-    for idx in arange(data_source[1].shape[1]):
-        year = data_source[1][3][idx][:4]
-        region = data_source[1][64][idx]
-
-        if not year in count:
-            count[year] = dict()
-        if not region in count[year]:
-            count[year][region] = 0
+    accidents = pd.DataFrame({
+        'year': data_source[1][3].astype('datetime64[Y]').astype(int) + 1970,
+        'region': data_source[1][64],
+    })
 
-        count[year][region] += 1
-    
-    return count
+    return accidents.groupby(['year', 'region']).size().unstack(fill_value=0)
 
 
 def plot_stat(data_source, fig_location = None, show_figure = False):
@@ -65,13 +59,11 @@ def plot_stat(data_source, fig_location = None, show_figure = False):
     figure, axs = plt.subplots(len(accidents_count), figsize=(16,9), sharey='col')
     figure.suptitle('Statistika nehod na silnicich v Ceske republice')
 
-    for idx, ax in enumerate(axs):
-        year = sorted(accidents_count.keys())[idx]
-
+    for (year, count), ax in zip(accidents_count.iterrows(), axs):
         ax.set_xlabel("Regiony")
         ax.set_ylabel("Pocet nehod v {}".format(year))
-        ax.bar(accidents_count[year].keys(),
-               accidents_count[year].values(),
+        ax.bar(count.index,
+               count.values,
                width=0.35, bottom=0, align='center',
                color='C3')
 
@@ -93,4 +85,7 @@ def plot_stat(data_source, fig_location = None, show_figure = False):
 
 if __name__ == "__main__":
     args = parse_arguments()
+    if not args.show_figure:
+        # plots are only saved, so the GUI backend is not needed
+        matplotlib.use('Agg')
     plot_stat(DataDownloader().get_list(['PHA', 'STC', 'HHK']), args.fig_location, args.show_figure)
@@ -4,8 +4,8 @@
 
 import os
 from sys import getsizeof
-from copy import deepcopy
 
+import matplotlib
 from matplotlib import pyplot as plt
 import pandas as pd
 
@@ -36,13 +36,11 @@ def _subplot_damage(damage_df: pd.DataFrame, ax: plt.Axes, region: str):
        for specified region.
 
     Args:
-        damage_df (pd.DataFrame) - the given dataframe with the data about damage
+        damage_df (pd.DataFrame) - the given dataframe with counts of accidents
+                                   in the region by damage (rows) and causes (columns)
         ax (pyplot.Axes) - the subplot where the graph will be plotted
         region (str) - the specified region
     """
-    damage_df = damage_df.loc[lambda df: df['region'] == region]
-    damage_df = pd.crosstab(damage_df['fine'], damage_df['cause'])
-
     with plt.style.context('seaborn-paper'):
         damage_df.plot.bar(
             ax=ax, logy=True, ylim=[10**-1, 10**5],
@@ -82,18 +80,31 @@ def get_dataframe(filename: str, verbose: bool = False) -> pd.DataFrame:
                             the obtained data shall be shown
 
     Returns:
-        data (pd.DataFrame) - the dataframe with all data about accidents
+        data (pd.DataFrame) - the dataframe with all data about accidents,
+                              extended by the binned damage (fine) and cause
     """
     data = pd.read_pickle(filename)
-    data['date'] = deepcopy(data['p2a']).astype('datetime64[ns]')
+    data['date'] = pd.to_datetime(data['p2a'], format='%Y-%m-%d', cache=True)
 
-    original_size_mb = getsizeof(data)/1048576
+    # damage and cause categories are fixed, so they are binned only once here
+    fine_bins = [0, 500, 2000, 5000, 10000, float("inf")]
+    data['fine'] = pd.cut(data['p53'], bins=fine_bins, right=False).cat.rename_categories(
+        ['< 50', '50-200', '200-500', '500-1000', '> 1000']
+    )
+
+    causes_bins = pd.IntervalIndex.from_tuples([
+        (100, 100), (201, 209), (301, 311),
+        (401, 414), (501, 516), (601, 615)
+    ]).set_closed('both')
+    data['cause'] = pd.cut(data['p12'], causes_bins).cat.rename_categories([
+        'Nezaviněná řidičem', 'Nepřiměřená rychlost jízdy', 'Nesprávné předjíždění',
+        'Nedání přednosti v jízdě', 'Nesprávný způsob jízdy', 'Technická závada vozidla'
+    ])
 
-    for col in data:
-        if col in ['region', 'p13a', 'p13b', 'p13c']:
-            continue
+    original_size_mb = getsizeof(data)/1048576
 
-        data[col] = data.pop(col).astype("category")
+    skip_cols = ['region', 'p13a', 'p13b', 'p13c', 'fine', 'cause']
+    data = data.astype({col: 'category' for col in data if col not in skip_cols})
 
     new_size_mb = getsizeof(data)/1048576
     if verbose:
@@ -150,30 +161,14 @@ def plot_damage(df: pd.DataFrame, fig_location: str = None,
         fig_location (str) - a path, where the graph will be saved
         show_figure (boolean) - flag indicating that a plot shall be shown
     """
-    regions_df = _get_region_data(df)
-
-    fine_bins = [0, 500, 2000, 5000, 10000, float("inf")]
-    fines = pd.cut(regions_df['p53'].to_list(), bins=fine_bins, right=False)
-    fines.categories = ['< 50', '50-200', '200-500', '500-1000', '> 1000']
-
-    causes_bins = pd.IntervalIndex.from_tuples([
-        (100, 100), (201, 209), (301, 311),
-        (401, 414), (501, 516), (601, 615)
-    ]).set_closed('both')
-    causes = pd.cut(regions_df['p12'].to_list(), causes_bins)
-    causes.categories = [
-        'Nezaviněná řidičem', 'Nepřiměřená rychlost jízdy', 'Nesprávné předjíždění',
-        'Nedání přednosti v jízdě', 'Nesprávný způsob jízdy', 'Technická závada vozidla'
-    ]
-
-    damage_df = pd.DataFrame({'region': regions_df['region'], 'fine': fines, 'cause': causes})
+    regions_df = _get_region_data(df)[['region', 'fine', 'cause']]
+    damage_df = regions_df.groupby(['region', 'fine', 'cause'], observed=False).size()
+    damage_df = damage_df.unstack('cause', fill_value=0)
 
     figure, axs = plt.subplots(2, 2, figsize=(16, 9))
     figure.suptitle('Nehody v závislosti na škodě na vozidlech v jednotlivých regionech')
-    _subplot_damage(damage_df, axs[0][0], 'HKK')
-    _subplot_damage(damage_df, axs[0][1], 'JHM')
-    _subplot_damage(damage_df, axs[1][0], 'PHA')
-    _subplot_damage(damage_df, axs[1][1], 'PLK')
+    for (region, region_df), ax in zip(damage_df.groupby(level='region'), axs.flat):
+        _subplot_damage(region_df.droplevel('region'), ax, region)
 
     # set the only one legend for all existing subplots
     patches, labels = axs[1][1].get_legend_handles_labels()
@@ -201,9 +196,9 @@ def plot_surface(df: pd.DataFrame, fig_location: str = None,
         show_figure (boolean) - flag indicating that a plot shall be shown
     """
     regions_df = _get_region_data(df)[['region', 'date', 'p16']]
-    surface_df = pd.crosstab(index=[regions_df['region'], regions_df['date']],
-                             columns=regions_df['p16'], dropna=False)
-    surface_df.columns.categories = [
+    surface_df = regions_df.groupby(['region', 'date', 'p16'], observed=False).size()
+    surface_df = surface_df.unstack('p16', fill_value=0)
+    surface_df.columns = [
         'Jiný stav', 'Suchý neznečištěný', 'Suchý znečištěný',
         'Mokrý', 'Bláto', 'Náledí, ujetý sníh - posypané',
         'Náledí, ujetý sníh - neposypané', 'Rozlitý olej, nafta apod.',
@@ -233,6 +228,8 @@ def plot_surface(df: pd.DataFrame, fig_location: str = None,
 
 
 if __name__ == "__main__":
+    # plots are only saved, so the GUI backend is not needed
+    matplotlib.use('Agg')
     dataframe = get_dataframe("accidents.pkl.gz")
     plot_conseq(dataframe, fig_location="01_nasledky.png")
     plot_damage(dataframe, "02_priciny.png")
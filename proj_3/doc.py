@@ -5,6 +5,7 @@ import geopandas as gpd
 import pandas as pd
 import numpy as np
 import contextily as ctx
+import matplotlib
 import matplotlib.pyplot as plt
 
 
@@ -82,13 +83,14 @@ def generate_table(df: pd.DataFrame):
 
 def generate_graph(df: pd.DataFrame):
     """Vykresleni grafu o mistach nehody"""
-    df = df.loc[df.region == 'JHM']
-    df = df.loc[(df.p11 != 4) & (df.p11 != 5)]
-    df = df.loc[~(np.isnan(df.d) | np.isnan(df.e))]
+    df = df.loc[np.logical_and.reduce([
+        df.region == 'JHM', ~df.p11.isin([4, 5]), df.d.notna(), df.e.notna()
+    ])]
     df['p11'] = (df['p11'] >= 7)
 
-    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.d, df.e))
-    gdf.set_crs(epsg=5514)
+    xs = df['d'].to_numpy(np.float64, copy=False)
+    ys = df['e'].to_numpy(np.float64, copy=False)
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(xs, ys), crs='EPSG:5514')
 
     fig, ax = plt.subplots(figsize=(16, 9))
     gdf.loc[gdf.p11 == True].plot(ax=ax, markersize=5)
@@ -107,6 +109,8 @@ def generate_graph(df: pd.DataFrame):
 
 
 if __name__ == "__main__":
+    # plots are only saved, so the GUI backend is not needed
+    matplotlib.use('Agg')
     df = get_dataframe('accidents.pkl.gz')
     generate_table(df)
     generate_graph(df)
\ No newline at end of file
@@ -27,11 +27,34 @@ def _save_fig_to_location(fig_location: str, fig: plt.Figure):
     fig.savefig(fig_location)
 
 
+def _add_shared_basemap(axs):
+    """An utilitary function for adding the same basemap into the subplots
+
+    The tiles are fetched only for the first subplot and the resulting image
+    is reused in the others, so all subplots must share the same limits.
+
+    Args:
+        axs (list) - the subplots where the basemap will be drawn
+    """
+    first_ax, *other_axs = axs
+    source = ctx.providers.Stamen.TonerLite
+    ctx.add_basemap(first_ax, crs='epsg:5514', source=source, zoom=10)
+
+    basemap = first_ax.images[-1]
+    for ax in other_axs:
+        limits = ax.axis()
+        ax.imshow(basemap.get_array(), extent=basemap.get_extent(),
+                  interpolation=basemap.get_interpolation(), zorder=basemap.get_zorder())
+        ax.axis(limits)
+        ctx.add_attribution(ax, source.get('attribution'))
+
+
 def make_geo(df: pd.DataFrame) -> gpd.GeoDataFrame:
     """ Konvertovani dataframe do gpd.GeoDataFrame se spravnym kodovani"""
-    df = df.loc[~(np.isnan(df.d) | np.isnan(df.e))]
-    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.d, df.e))
-    gdf.set_crs(epsg=5514)
+    df = df.dropna(subset=['d', 'e'])
+    xs = df['d'].to_numpy(np.float64, copy=False)
+    ys = df['e'].to_numpy(np.float64, copy=False)
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(xs, ys), crs='EPSG:5514')
 
     return gdf
 
@@ -41,7 +64,6 @@ def plot_geo(gdf: gpd.GeoDataFrame, fig_location: str = None,
     """ Vykresleni grafu s dvemi podgrafy podle lokality nehody """
     def subplot_geo(gdf, ax, place, title, color):
         gdf.loc[gdf.p5a == place].plot(ax=ax, markersize=5, color=color)
-        ctx.add_basemap(ax, crs='epsg:5514', source=ctx.providers.Stamen.TonerLite, zoom=10)
 
         ax.set_title(title)
         ax.set_xlim((-680276.578125, -520931.825))
@@ -53,12 +75,14 @@ def plot_geo(gdf: gpd.GeoDataFrame, fig_location: str = None,
     fig, ax = plt.subplots(1, 2, figsize=(16, 9))
     subplot_geo(gdf, ax[0], 1, 'Nehody v JHM kraji: v obci', 'blue')
     subplot_geo(gdf, ax[1], 2, 'Nehody v JHM kraji: mimo obec', 'red')
+    _add_shared_basemap(ax)
 
     if show_figure:
         plt.show()
 
     if fig_location:
         _save_fig_to_location(fig_location, fig)
+    plt.close(fig)
 
 
 def plot_cluster(gdf: gpd.GeoDataFrame, fig_location: str = None,
@@ -67,20 +91,16 @@ def plot_cluster(gdf: gpd.GeoDataFrame, fig_location: str = None,
     gdf = gdf.loc[gdf.region == 'JHM']
 
     # Vytvoreni shluku
-    gdf_clusters = gdf.copy().set_geometry(gdf.centroid)
-    coords = np.dstack([gdf_clusters.geometry.x, gdf_clusters.geometry.y]).reshape(-1, 2)
-    db = sklearn.cluster.MiniBatchKMeans(n_clusters=15).fit(coords)
-
-    gdf_clusters["cluster"] = db.labels_
-    gdf_clusters = gdf_clusters.dissolve(
-        by="cluster", aggfunc={"p1": "count"}
-    ).rename(columns={'p1': "cnt"})
-    gdf_coords = gpd.GeoDataFrame(geometry=gpd.points_from_xy(
-        db.cluster_centers_[:, 0], db.cluster_centers_[:, 1]
-    ))
-    gdf_clusters = gdf_clusters.merge(
-        gdf_coords, left_on="cluster", right_index=True
-    ).set_geometry("geometry_y")
+    centroids = gdf.centroid
+    coords = np.column_stack([centroids.x, centroids.y])
+    db = sklearn.cluster.MiniBatchKMeans(
+        n_clusters=15, batch_size=4096, n_init=1, max_iter=50, random_state=0
+    ).fit(coords.astype(np.float32, copy=False))
+
+    gdf_clusters = gpd.GeoDataFrame(
+        {"cnt": np.bincount(db.labels_, minlength=db.n_clusters)},
+        geometry=gpd.points_from_xy(db.cluster_centers_[:, 0], db.cluster_centers_[:, 1])
+    )
 
     # Vytvoreni grafu
     fig = plt.figure(figsize=(16, 9))
@@ -100,6 +120,7 @@ def plot_cluster(gdf: gpd.GeoDataFrame, fig_location: str = None,
 
     if fig_location:
         _save_fig_to_location(fig_location, fig)
+    plt.close(fig)
 
 
 if __name__ == "__main__":